@@ -57,16 +57,14 @@ def compute_cumulative():
             all_cat_counts.append(cc)
     if all_test_counts:
         combined_tc = pd.concat(all_test_counts, ignore_index=True)
-        cumulative_tc = combined_tc.groupby('TestName')[['IPD', 'OPD', 'Total']].sum().reset_index()
-        grand_total_tc = pd.DataFrame([{"TestName": "Grand Total", "IPD": int(cumulative_tc["IPD"].sum()), "OPD": int(cumulative_tc["OPD"].sum()), "Total": int(cumulative_tc["Total"].sum())}])
-        cumulative_tc = pd.concat([cumulative_tc, grand_total_tc], ignore_index=True)
+        cumulative_tc = combined_tc.groupby('TestName', as_index=False)[['IPD', 'OPD', 'Total']].sum()
+        cumulative_tc.loc[len(cumulative_tc)] = ["Grand Total", int(cumulative_tc["IPD"].sum()), int(cumulative_tc["OPD"].sum()), int(cumulative_tc["Total"].sum())]
     else:
         cumulative_tc = None
     if all_cat_counts:
         combined_cc = pd.concat(all_cat_counts, ignore_index=True)
-        cumulative_cc = combined_cc.groupby('Category')[['Count']].sum().reset_index()
-        grand_total_cc = pd.DataFrame([{"Category": "Grand Total", "Count": int(cumulative_cc["Count"].sum())}])
-        cumulative_cc = pd.concat([cumulative_cc, grand_total_cc], ignore_index=True)
+        cumulative_cc = combined_cc.groupby('Category', as_index=False)[['Count']].sum()
+        cumulative_cc.loc[len(cumulative_cc)] = ["Grand Total", int(cumulative_cc["Count"].sum())]
     else:
         cumulative_cc = None
     return cumulative_tc, cumulative_cc
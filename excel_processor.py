@@ -1,15 +1,25 @@
+import hashlib
 import streamlit as st
 import pandas as pd
 import plotly.graph_objects as go
 import plotly.express as px
+from io import BytesIO
 from datetime import datetime
 
 from config import default_dates
-from helpers import build_test_counts, build_category_counts, style_excel
+from helpers import read_report, build_test_counts, build_category_counts, style_excel
 from data_persistence import save_processed_data, load_processed_data, delete_processed_data, get_saved_dates, compute_cumulative
 
 st.set_page_config(page_title="Pathology Report", page_icon="🧪", layout="wide")
 
+# ============================================================================
+# CACHED REPORT FILE (a handful of recent reports is plenty for daily uploads)
+# ============================================================================
+@st.cache_data(max_entries=4)
+def build_report_file(test_counts, cat_counts, report_date_str):
+    return style_excel(test_counts, cat_counts, report_date_str).getvalue()
+
+
 # ============================================================================
 # BLACK & WHITE MODERN GLOSSY CSS STYLING
 # ============================================================================
@@ -368,29 +378,38 @@ with tab1:
     
     if uploaded_file:
         try:
-            df = pd.read_excel(uploaded_file)
-            
-            # Validate required columns
-            required_columns = ['TestName', 'subgroup']
-            missing = [col for col in required_columns if col not in df.columns]
-            if missing:
-                st.error(f"❌ Missing columns: {', '.join(missing)}")
-                st.stop()
-            
-            # Extract date from data
-            if 'Date' in df.columns:
-                dates = pd.to_datetime(df['Date'].dropna()).dt.date.unique()
-                report_date = dates[0] if len(dates) > 0 else datetime.today().date()
-                report_date_str = report_date.strftime('%d-%m-%Y')
-            else:
-                report_date_str = datetime.today().strftime('%d-%m-%Y')
-            
-            # Process data
-            test_counts = build_test_counts(df)
-            cat_counts, categorized_df = build_category_counts(df)
+            # Only parse, process and save when a new file is uploaded;
+            # widget reruns reuse the summary kept in session state
+            digest = hashlib.sha256(uploaded_file.getvalue()).hexdigest()
+            if st.session_state.get('upload_digest') != digest:
+                df = read_report(BytesIO(uploaded_file.getvalue()))
+                
+                # Validate required columns
+                required_columns = ['TestName', 'subgroup']
+                missing = [col for col in required_columns if col not in df.columns]
+                if missing:
+                    st.error(f"❌ Missing columns: {', '.join(missing)}")
+                    st.stop()
+                
+                # Extract date from data
+                if 'Date' in df.columns:
+                    dates = pd.to_datetime(df['Date'].dropna()).dt.date.unique()
+                    report_date = dates[0] if len(dates) > 0 else datetime.today().date()
+                    report_date_str = report_date.strftime('%d-%m-%Y')
+                else:
+                    report_date_str = datetime.today().strftime('%d-%m-%Y')
+                
+                # Process data
+                test_counts = build_test_counts(df)
+                cat_counts = build_category_counts(df)
+                
+                # Save data
+                save_processed_data(report_date_str, df, test_counts, cat_counts)
+                
+                st.session_state.upload_digest = digest
+                st.session_state.upload_report = (report_date_str, len(df), test_counts, cat_counts)
             
-            # Save data
-            save_processed_data(report_date_str, df, test_counts, cat_counts)
+            report_date_str, total_tests, test_counts, cat_counts = st.session_state.upload_report
             
             st.success(f"✅ Report for {report_date_str} processed successfully!")
             
@@ -405,10 +424,9 @@ with tab1:
             with col2:
                 st.markdown(f"### 🏥 Hospital: Aarogyadham")
             with col3:
-                excel_report = style_excel(test_counts, cat_counts, report_date_str)
                 st.download_button(
                     label="⬇️ Download Report",
-                    data=excel_report.getvalue(),
+                    data=build_report_file(test_counts, cat_counts, report_date_str),
                     file_name=f"Report_{report_date_str}.xlsx",
                     mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
                     use_container_width=True
@@ -422,7 +440,7 @@ with tab1:
             st.markdown("### 📊 Quick Metrics")
             m1, m2, m3 = st.columns(3)
             with m1:
-                st.metric("📋 Total Tests", len(df), delta=None)
+                st.metric("📋 Total Tests", total_tests, delta=None)
             with m2:
                 ipd_count = int(test_counts.iloc[-1]["IPD"]) if not test_counts.empty else 0
                 st.metric("🛏️ IPD", ipd_count)
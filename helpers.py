@@ -1,23 +1,91 @@
+import importlib.util
+import ahocorasick
+import numpy as np
 import pandas as pd
 from io import BytesIO
 from openpyxl import load_workbook
-from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
+from pyexcelerate import Workbook, Style, Font, Fill, Color, Alignment
+from pyexcelerate.Border import Border
+from pyexcelerate.Borders import Borders
 import config
 
+CALAMINE_AVAILABLE = importlib.util.find_spec("python_calamine") is not None
+
 OPENAI_AVAILABLE = config.OPENAI_AVAILABLE
 openai = getattr(config, 'openai', None)
 CATEGORY_RULES = config.CATEGORY_RULES
+CATEGORY_RULES_UPPER = {cat: tuple(k.upper() for k in keys) for cat, keys in CATEGORY_RULES.items()}
+CATEGORY_NAMES = list(CATEGORY_RULES_UPPER)
+BOOKING_MODES = ["IPD", "OPD Indent"]
+
+
+def _build_category_automaton():
+    automaton = ahocorasick.Automaton()
+    for idx, keys in enumerate(CATEGORY_RULES_UPPER.values()):
+        for kw in keys:
+            # value is the category's rule order, so the earliest category wins on overlap
+            automaton.add_word(kw, min(idx, automaton.get(kw, idx)))
+    automaton.make_automaton()
+    return automaton
+
+
+CATEGORY_AUTOMATON = _build_category_automaton()
+
+THIN_BORDER = Border(color=Color(0, 0, 0), style="thin")
+FULL_BORDER = Borders(top=THIN_BORDER, left=THIN_BORDER, right=THIN_BORDER, bottom=THIN_BORDER)
+HEADER_STYLE = Style(font=Font(bold=True), fill=Fill(background=Color(0x87, 0xCE, 0xFA)), borders=FULL_BORDER)
+TOTAL_STYLE = Style(font=Font(bold=True), fill=Fill(background=Color(0xFF, 0xFF, 0xCC)), borders=FULL_BORDER)
+BODY_STYLE = Style(borders=FULL_BORDER)
+TITLE_STYLE = Style(font=Font(bold=True, size=14), alignment=Alignment(horizontal="center"))
+
+
+STRING_COLUMNS = ["TestName", "BookingMode", "subgroup"]
+
+
+def _dedupe_header(header):
+    header = list(header)
+    reserved = set(header)
+    names = []
+    for name in header:
+        # a repeat takes the first "name.N" not already in the header or handed out (as read_excel does)
+        if name in names:
+            n = 1
+            while f"{name}.{n}" in reserved or f"{name}.{n}" in names:
+                n += 1
+            name = f"{name}.{n}"
+        names.append(name)
+    return names
 
 
-def normalize_bookingmode(x):
-    s = "" if pd.isna(x) else str(x).strip().upper()
-    if "IPD" in s:
-        return "IPD"
-    return "OPD Indent"
+def _read_report_openpyxl(uploaded_file):
+    wb = load_workbook(uploaded_file, read_only=True, data_only=True)
+    try:
+        rows = wb.active.iter_rows(values_only=True)
+        header = _dedupe_header(f"Unnamed: {i}" if h is None else h for i, h in enumerate(next(rows, ())))
+        data = list(rows)
+    finally:
+        wb.close()
+    while data and all(v is None for v in data[-1]):
+        data.pop()
+    df = pd.DataFrame(data, columns=header)
+    for col in STRING_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].where(df[col].isna(), df[col].astype(str))
+    return df
+
+
+def read_report(uploaded_file):
+    if CALAMINE_AVAILABLE:
+        return pd.read_excel(uploaded_file, engine="calamine", dtype={col: str for col in STRING_COLUMNS})
+    return _read_report_openpyxl(uploaded_file)
+
+
+def ai_enabled():
+    return bool(OPENAI_AVAILABLE and openai and getattr(openai, 'api_key', None))
 
 
 def ai_batch_categorize(unknown_tests):
-    if not unknown_tests or not OPENAI_AVAILABLE or not openai or not getattr(openai, 'api_key', None):
+    if not unknown_tests or not ai_enabled():
         return {}
     tests_text = "\n".join([f"- Test: {t}, Subgroup: {s}" for t, s in unknown_tests])
     prompt = f"Categories: Biochemistry, Clinical, Hematology, Immunology. Assign each test. Return CSV: TestName,Subgroup,Category\n{tests_text}"
@@ -34,82 +102,69 @@ def ai_batch_categorize(unknown_tests):
 
 
 def build_test_counts(df):
-    df = df.copy()
     if 'BookingMode' in df.columns:
-        df["BookingMode_norm"] = df["BookingMode"].apply(normalize_bookingmode)
+        is_ipd = df["BookingMode"].astype(str).str.upper().str.contains("IPD", na=False).to_numpy()
     else:
-        df["BookingMode_norm"] = "OPD Indent"
-    pivot = df.pivot_table(index="TestName", columns="BookingMode_norm", aggfunc="size", fill_value=0).reset_index()
-    pivot["IPD"] = pivot.get("IPD", 0)
-    pivot["OPD"] = pivot.get("OPD Indent", 0)
-    pivot["Total"] = pivot[["IPD", "OPD"]].sum(axis=1)
-    result = pivot[["TestName", "IPD", "OPD", "Total"]].sort_values("TestName").reset_index(drop=True)
-    grand_total = pd.DataFrame([{"TestName": "Grand Total", "IPD": int(result["IPD"].sum()), "OPD": int(result["OPD"].sum()), "Total": int(result["Total"].sum())}])
-    return pd.concat([result, grand_total], ignore_index=True)
+        is_ipd = np.zeros(len(df), dtype=bool)
+    mode = pd.Series(pd.Categorical.from_codes(np.where(is_ipd, 0, 1), categories=BOOKING_MODES), index=df.index, name="BookingMode_norm")
+    counts = df.groupby([df["TestName"].astype("category"), mode], observed=True).size().unstack(fill_value=0)
+    counts = counts.reindex(columns=BOOKING_MODES, fill_value=0).rename(columns={"OPD Indent": "OPD"})
+    counts.columns = counts.columns.astype(str)
+    counts["Total"] = counts.sum(axis=1)
+    result = counts.rename_axis(index="TestName", columns=None).reset_index()
+    result.loc[len(result)] = ["Grand Total", int(result["IPD"].sum()), int(result["OPD"].sum()), int(result["Total"].sum())]
+    return result
+
+
+def _match_categories(texts, default):
+    matches = (min((idx for _, idx in CATEGORY_AUTOMATON.iter(t)), default=None) for t in texts.tolist())
+    return pd.Series([default if idx is None else CATEGORY_NAMES[idx] for idx in matches], index=texts.index, dtype=object)
 
 
 def build_category_counts(df):
-    df = df.copy()
-    unknown_tests = []
-    final_cats = []
-    for _, row in df.iterrows():
-        text = f"{row['TestName']} {row['subgroup']}".upper()
-        final = next((cat for cat, keys in CATEGORY_RULES.items() if any(k.upper() in text for k in keys)), None)
-        if not final:
-            unknown_tests.append((str(row['TestName']), str(row['subgroup'])))
-        final_cats.append(final)
-    ai_mapping = ai_batch_categorize(unknown_tests)
-    df["Final_Category"] = [c or ai_mapping.get((str(r.TestName), str(r.subgroup)), "Biochemistry") for c, r in zip(final_cats, df.itertuples())]
-    results = [{"Category": c, "Count": int((df["Final_Category"] == c).sum())} for c in CATEGORY_RULES.keys()]
+    texts = df["TestName"].astype(str).str.cat(df["subgroup"].astype(str), sep=" ", na_rep="nan").str.upper()
+    use_ai = ai_enabled()
+    final = _match_categories(texts, None if use_ai else "Biochemistry")
+    if use_ai:
+        unknown = final.isna()
+        unknown_tests = [(str(t), str(s)) for t, s in df.loc[unknown, ["TestName", "subgroup"]].itertuples(index=False)]
+        ai_mapping = ai_batch_categorize(unknown_tests)
+        final[unknown] = [ai_mapping.get(key, "Biochemistry") for key in unknown_tests]
+    vc = final.value_counts()
+    results = [{"Category": c, "Count": int(vc.get(c, 0))} for c in CATEGORY_RULES]
     results.append({"Category": "Grand Total", "Count": int(len(df))})
-    return pd.DataFrame(results), df
+    return pd.DataFrame(results)
+
+
+def _style_table(ws, table, header_row):
+    cols = range(1, len(table.columns) + 1)
+    row_styles = [HEADER_STYLE] + [TOTAL_STYLE if "Grand Total" in name else BODY_STYLE for name in table.iloc[:, 0].astype(str)]
+    for row, style in enumerate(row_styles, header_row):
+        for col in cols:
+            ws.set_cell_style(row, col, style)
 
 
 def style_excel(test_counts, cat_counts, report_date_str):
+    test_header = 3
+    cat_header = test_header + len(test_counts) + 4
+    data = (
+        [[f"DAILY PATHOLOGY REPORT - {report_date_str}"], []]
+        + [list(test_counts.columns)] + test_counts.values.tolist()
+        + [[], [], []]
+        + [list(cat_counts.columns)] + cat_counts.values.tolist()
+    )
+
+    wb = Workbook()
+    ws = wb.new_sheet("Analysis", data=data)
+    ws.range("A1", "D1").merge()
+    ws.set_cell_style(1, 1, TITLE_STYLE)
+    _style_table(ws, test_counts, test_header)
+    _style_table(ws, cat_counts, cat_header)
+
+    ws.set_col_style(1, Style(size=45))
+    for col in range(2, 5):
+        ws.set_col_style(col, Style(size=12))
+
     output = BytesIO()
-    with pd.ExcelWriter(output, engine="openpyxl") as writer:
-        test_counts.to_excel(writer, sheet_name="Analysis", startrow=2, index=False)
-        start_cat = len(test_counts) + 5
-        cat_counts.to_excel(writer, sheet_name="Analysis", startrow=start_cat+1, index=False)
-
-    wb = load_workbook(filename=BytesIO(output.getvalue()))
-    ws = wb.active
-
-    thin_side = Side(border_style="thin", color="000000")
-    full_border = Border(top=thin_side, left=thin_side, right=thin_side, bottom=thin_side)
-    header_fill = PatternFill(start_color="87CEFA", end_color="87CEFA", fill_type="solid")
-    total_fill = PatternFill(start_color="FFFFCC", end_color="FFFFCC", fill_type="solid")
-
-    ws.merge_cells("A1:D1")
-    ws["A1"] = f"DAILY PATHOLOGY REPORT - {report_date_str}"
-    ws["A1"].font = Font(bold=True, size=14)
-    ws["A1"].alignment = Alignment(horizontal="center")
-
-    for row in ws.iter_rows(min_row=3, max_row=3 + len(test_counts), min_col=1, max_col=4):
-        for cell in row:
-            cell.border = full_border
-            if cell.row == 3:
-                cell.fill = header_fill
-                cell.font = Font(bold=True)
-            if "Grand Total" in str(ws.cell(row=cell.row, column=1).value):
-                cell.fill = total_fill
-                cell.font = Font(bold=True)
-
-    cat_header_idx = start_cat + 2
-    for row in ws.iter_rows(min_row=cat_header_idx, max_row=cat_header_idx + len(cat_counts), min_col=1, max_col=2):
-        for cell in row:
-            cell.border = full_border
-            if cell.row == cat_header_idx:
-                cell.fill = header_fill
-                cell.font = Font(bold=True)
-            if "Grand Total" in str(ws.cell(row=cell.row, column=1).value):
-                cell.fill = total_fill
-                cell.font = Font(bold=True)
-
-    ws.column_dimensions["A"].width = 45
-    for col in ["B", "C", "D"]:
-        ws.column_dimensions[col].width = 12
-
-    final_output = BytesIO()
-    wb.save(final_output)
-    return final_output
+    wb.save(output)
+    return output
@@ -1 +1,84 @@
-print("hello")
\ No newline at end of file
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook, load_workbook
+
+import helpers
+
+
+def test_blank_cells_still_match():
+    df = pd.DataFrame({
+        "TestName": [np.nan, "BLOOD GROUP", "URINE ANALYSIS"],
+        "subgroup": ["foo CA-125", np.nan, None],
+    })
+    counts = helpers.build_category_counts(df).set_index("Category")["Count"]
+    assert counts.to_dict() == {"Biochemistry": 0, "Clinical": 1, "Hematology": 1, "Immunology": 1, "Grand Total": 3}, counts
+
+
+def _test_counts_frame(rows):
+    return pd.DataFrame(rows, columns=["TestName", "IPD", "OPD", "Total"]).astype({"IPD": "int64", "OPD": "int64", "Total": "int64"})
+
+
+def test_build_test_counts():
+    df = pd.DataFrame({
+        "TestName": ["CBC", np.nan, "ACTH", "CBC", "ACTH"],
+        "subgroup": ["a", "b", "c", "d", "e"],
+        "BookingMode": ["ipd ", "IPD", np.nan, "OPD", "opd indent"],
+    })
+    expected = _test_counts_frame([["ACTH", 0, 2, 2], ["CBC", 1, 1, 2], ["Grand Total", 1, 3, 4]])
+    pd.testing.assert_frame_equal(helpers.build_test_counts(df), expected)
+
+    expected = _test_counts_frame([["ACTH", 0, 2, 2], ["CBC", 0, 2, 2], ["Grand Total", 0, 4, 4]])
+    pd.testing.assert_frame_equal(helpers.build_test_counts(df.drop(columns="BookingMode")), expected)
+
+    expected = _test_counts_frame([["ACTH", 2, 0, 2], ["CBC", 2, 0, 2], ["Grand Total", 4, 0, 4]])
+    pd.testing.assert_frame_equal(helpers.build_test_counts(df.assign(BookingMode="IPD")), expected)
+
+    expected = _test_counts_frame([["Grand Total", 0, 0, 0]])
+    pd.testing.assert_frame_equal(helpers.build_test_counts(df.iloc[:0]), expected)
+
+
+def test_automaton_matches_first_rule():
+    keywords = [kw for keys in helpers.CATEGORY_RULES.values() for kw in keys]
+    texts = pd.Series([f"{a} {b}" for a in keywords + ["nan", "foo"] for b in keywords[::3] + ["nan", "bar"]]).str.upper()
+    expected = [next((cat for cat, keys in helpers.CATEGORY_RULES.items() if any(k.upper() in t for k in keys)), None) for t in texts]
+    assert helpers._match_categories(texts, None).tolist() == expected
+
+
+def test_style_excel_layout():
+    test_counts = _test_counts_frame([["ACTH", 0, 2, 2], ["CBC", 1, 1, 2], ["Grand Total", 1, 3, 4]])
+    cat_counts = pd.DataFrame({"Category": ["Hematology", "Grand Total"], "Count": [4, 4]})
+    ws = load_workbook(helpers.style_excel(test_counts, cat_counts, "17-05-2026")).active
+
+    assert [str(r) for r in ws.merged_cells.ranges] == ["A1:D1"]
+    assert ws["A1"].value == "DAILY PATHOLOGY REPORT - 17-05-2026"
+    assert ws["A1"].font.b and ws["A1"].alignment.horizontal == "center"
+    assert ws.column_dimensions["A"].width == 45
+    assert all(ws.column_dimensions[col].width == 12 for col in "BCD")
+
+    # test table: header on row 3, Grand Total on row 6; category table starts 4 rows later
+    for header_row, total_row, width in [(3, 6, 4), (10, 12, 2)]:
+        for col in range(1, width + 1):
+            header, total = ws.cell(header_row, col), ws.cell(total_row, col)
+            assert header.font.b and header.fill.fgColor.rgb[-6:] == "87CEFA"
+            assert total.font.b and total.fill.fgColor.rgb[-6:] == "FFFFCC"
+            for row in range(header_row, total_row + 1):
+                border = ws.cell(row, col).border
+                assert all(side.style == "thin" for side in (border.top, border.left, border.right, border.bottom))
+    assert ws.cell(10, 1).value == "Category" and ws.cell(12, 1).value == "Grand Total"
+    assert [c.value for c in ws[5]] == ["CBC", 1, 1, 2]
+    assert not ws["A4"].font.b and ws["A4"].fill.fill_type is None
+    assert all(isinstance(ws.cell(row, col).value, int) for row in (4, 5, 6) for col in (2, 3, 4))
+    assert ws["B12"].value == 4
+
+
+def test_fallback_reader_dedupes_header():
+    wb = Workbook()
+    wb.active.append(["TestName", "subgroup", "TestName", "TestName.1", "TestName", None])
+    wb.active.append(["BLOOD GROUP", "a", "b", "c", "d", 1])
+    buf = BytesIO()
+    wb.save(buf)
+    expected = list(pd.read_excel(BytesIO(buf.getvalue()), engine="openpyxl").columns)
+    assert list(helpers._read_report_openpyxl(BytesIO(buf.getvalue())).columns) == expected
+